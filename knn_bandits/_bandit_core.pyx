@@ -0,0 +1,47 @@
+# cython: language_level=3, boundscheck=False, wraparound=False
+"""
+Compiled kernels for the per-round scoring and weight update of ContextualBandit.
+"""
+from libc.math cimport INFINITY
+
+
+def choose_arm(const float[:, ::1] W, const float[::1] ctx):
+    """
+    Scores every arm against the context and returns the best arm with its score in a single pass over W.
+
+    Args:
+        W (np.ndarray): C-contiguous float32 weight matrix of shape (num_arms, num_features).
+        ctx (np.ndarray): C-contiguous float32 context vector of length num_features.
+
+    Returns:
+        Tuple[int, float]: The index of the best arm and its score.
+    """
+    cdef Py_ssize_t a, i
+    cdef Py_ssize_t best_arm = 0
+    cdef double score
+    cdef double best_score = -INFINITY
+    with nogil:
+        for a in range(W.shape[0]):
+            score = 0.0
+            for i in range(W.shape[1]):
+                score = score + W[a, i] * ctx[i]
+            if score > best_score:
+                best_arm = a
+                best_score = score
+    return best_arm, best_score
+
+
+def update_arm(float[:, ::1] W, Py_ssize_t arm, const float[::1] ctx, double step):
+    """
+    Adds step * ctx to the weight row of the given arm in place.
+
+    Args:
+        W (np.ndarray): C-contiguous float32 weight matrix of shape (num_arms, num_features).
+        arm (int): The index of the arm to update.
+        ctx (np.ndarray): C-contiguous float32 context vector of length num_features.
+        step (float): The scale applied to the context.
+    """
+    cdef Py_ssize_t i
+    with nogil:
+        for i in range(W.shape[1]):
+            W[arm, i] += step * ctx[i]
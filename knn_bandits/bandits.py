@@ -1,18 +1,112 @@
-import random
-from typing import List, Callable, Tuple
+from typing import List, Callable, Optional, Tuple
+
+import numpy as np
+
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = None
+
+try:
+    from scipy.linalg.blas import get_blas_funcs
+except ImportError:
+    _sgemv = _saxpy = None
+else:
+    # Looked up once for float32 rather than per instance, which also keeps instances picklable.
+    _sgemv, _saxpy = get_blas_funcs(('gemv', 'axpy'), dtype=np.float32)
+
+if njit is not None:
+    @njit(cache=True, fastmath=True)
+    def _nb_choose_arm(W, ctx):
+        """
+        Scores every arm against the context and returns the best arm with its score in a single pass over W.
+        """
+        best_arm = 0
+        best_score = -np.inf
+        for a in range(W.shape[0]):
+            score = 0.0
+            for i in range(W.shape[1]):
+                score += W[a, i] * ctx[i]
+            if score > best_score:
+                best_arm = a
+                best_score = score
+        return best_arm, best_score
+
+    @njit(cache=True, fastmath=True)
+    def _nb_update_arm(W, arm, ctx, step):
+        """
+        Adds step * ctx to the weight row of the given arm in place.
+        """
+        for i in range(W.shape[1]):
+            W[arm, i] += step * ctx[i]
+
+    @njit(cache=True, fastmath=True, parallel=True)
+    def _ope_kernel(W, X, actual_arms, rewards, zero):
+        """
+        Sums the rewards of the rows of X whose best-scoring arm matches the logged arm, in parallel over rows.
+        """
+        total_reward = 0.0
+        for n in prange(X.shape[0]):
+            best_arm = 0
+            best_score = zero
+            for a in range(W.shape[0]):
+                score = zero
+                for i in range(W.shape[1]):
+                    score += W[a, i] * X[n, i]
+                if a == 0 or score > best_score:
+                    best_arm = a
+                    best_score = score
+            if best_arm == actual_arms[n]:
+                total_reward += rewards[n]
+        return total_reward
+
+    _choose_arm_kernel, _update_arm_kernel = _nb_choose_arm, _nb_update_arm
+else:
+    _choose_arm_kernel = None
+    _update_arm_kernel = None
+    _ope_kernel = None
+
+try:
+    # The Cython extension takes precedence over Numba when it has been built.
+    from ._bandit_core import choose_arm as _choose_arm_kernel, update_arm as _update_arm_kernel
+except ImportError:
+    pass
+
+
+def _quantize_int8(a: np.ndarray, axis: Optional[int] = None) -> np.ndarray:
+    """
+    Symmetrically quantizes an array to int8, scaling so that the largest magnitude maps to 127.
+
+    Args:
+        a (np.ndarray): The array to quantize.
+        axis (Optional[int]): Axis along which to compute separate scales. Default is None (one scale for the whole array).
+
+    Returns:
+        np.ndarray: The quantized int8 array.
+    """
+    max_abs = np.abs(a).max(axis=axis, keepdims=True)
+    scale = 127.0 / np.where(max_abs > 0, max_abs, 1.0)
+    return np.clip(np.rint(a * scale), -127, 127).astype(np.int8)
+
 
 class ContextualBandit:
     """
     Contextual Bandit implementation with offline policy evaluation.
 
+    An instance is not safe to call from multiple threads, not even read-only methods such as choose_arm:
+    contexts and arm scores are staged in per-instance buffers that concurrent calls would overwrite.
+    Use one instance per thread (e.g. copy.deepcopy) or serialize access with a lock.
+
     Attributes:
         num_arms (int): Number of arms (actions) the bandit can choose from.
         num_features (int): Number of features in the context.
         learning_rate (float): Learning rate for updating the weights.
-        weights (List[List[float]]): List of weight vectors, one for each arm.
+        weights (np.ndarray): Weight matrix of shape (num_arms, num_features), one row for each arm.
     """
 
-    def __init__(self, num_arms: int, num_features: int, learning_rate: float = 0.1):
+    __slots__ = ('num_arms', 'num_features', 'learning_rate', 'weights', '_rng', '_context_buf', '_score_buf')
+
+    def __init__(self, num_arms: int, num_features: int, learning_rate: float = 0.1, seed: Optional[int] = None):
         """
         Initializes the ContextualBandit with the specified number of arms and context features.
 
@@ -20,62 +114,111 @@ class ContextualBandit:
             num_arms (int): Number of arms (actions).
             num_features (int): Number of features in the context.
             learning_rate (float): Learning rate for updating the weights. Default is 0.1.
+            seed (Optional[int]): Seed for the random number generator used to initialize the weights. Default is None.
         """
         self.num_arms = num_arms
         self.num_features = num_features
         self.learning_rate = learning_rate
-        self.weights: List[List[float]] = [self.initialize_weights(num_features) for _ in range(num_arms)]
+        self._rng = np.random.default_rng(seed)
+        # The scoring kernels and BLAS calls rely on a C-contiguous float32 matrix, so normalize whatever
+        # an overridden initialize_weights returns; this is a no-op for the default implementation.
+        self.weights: np.ndarray = np.ascontiguousarray(self.initialize_weights(num_arms, num_features), dtype=np.float32)
+        self._context_buf = np.empty(num_features, dtype=np.float32)
+        self._score_buf = np.empty(num_arms, dtype=np.float32)
 
-    def initialize_weights(self, num_features: int) -> List[float]:
+    def initialize_weights(self, num_arms: int, num_features: int) -> np.ndarray:
         """
-        Initializes the weights for an arm.
+        Initializes the weights for all arms.
 
         Args:
+            num_arms (int): Number of arms (actions).
             num_features (int): Number of features in the context.
 
         Returns:
-            List[float]: A list of randomly initialized weights.
+            np.ndarray: A contiguous float32 array of shape (num_arms, num_features) with randomly initialized weights.
         """
-        return [random.random() for _ in range(num_features)]
+        return self._rng.random((num_arms, num_features), dtype=np.float32)
 
-    def compute_dot_product(self, weights: List[float], context: List[float]) -> float:
+    def _as_context(self, context: np.ndarray, scratch: bool = True) -> np.ndarray:
         """
-        Computes the dot product between weights and context.
+        Returns the context as a contiguous float32 vector, copying only when needed.
 
         Args:
-            weights (List[float]): Weight vector for an arm.
-            context (List[float]): Context vector.
+            context (np.ndarray): The context vector. A contiguous float32 ndarray is used as is; anything else (e.g. a list of floats) is converted.
+            scratch (bool): Whether a conversion may be written into the reusable per-instance buffer. Pass False when the result must
+                stay valid across calls that may reuse this instance (e.g. a get_reward callback). Default is True.
 
         Returns:
-            float: The dot product of the weights and context.
+            np.ndarray: A contiguous float32 vector of length num_features.
         """
-        return sum(w * c for w, c in zip(weights, context))
+        if (isinstance(context, np.ndarray) and context.dtype == np.float32 and context.flags.c_contiguous
+                and context.shape == (self.num_features,)):
+            return context
+        # Checked explicitly because np.copyto would silently broadcast scalars and length-1 inputs.
+        if np.shape(context) != (self.num_features,):
+            raise ValueError(f"context must have shape ({self.num_features},), got {np.shape(context)}")
+        out = self._context_buf if scratch else np.empty(self.num_features, dtype=np.float32)
+        np.copyto(out, context)
+        return out
 
-    def choose_arm(self, context: List[float]) -> int:
+    def _choose_and_score(self, context: np.ndarray) -> Tuple[int, float]:
+        """
+        Chooses an arm based on the current context and returns it together with its predicted reward.
+
+        Args:
+            context (np.ndarray): The current context vector, already converted by _as_context.
+
+        Returns:
+            Tuple[int, float]: The index of the chosen arm and its score (the dot product of its weights and the context).
+        """
+        if _choose_arm_kernel is not None:
+            chosen_arm, score = _choose_arm_kernel(self.weights, context)
+            return int(chosen_arm), float(score)
+        values = self._score_buf
+        if _sgemv is not None:
+            # weights.T is Fortran-ordered, so BLAS reads it without a copy.
+            _sgemv(1.0, self.weights.T, context, beta=0.0, y=values, trans=1, overwrite_y=1)
+        else:
+            np.dot(self.weights, context, out=values)
+        chosen_arm = int(values.argmax())
+        return chosen_arm, float(values[chosen_arm])
+
+    def choose_arm(self, context: np.ndarray) -> int:
         """
         Chooses an arm based on the current context.
 
         Args:
-            context (List[float]): The current context vector.
+            context (np.ndarray): The current context vector. Passing a float32 ndarray avoids a per-call conversion.
 
         Returns:
             int: The index of the chosen arm.
         """
-        values = [self.compute_dot_product(self.weights[arm], context) for arm in range(self.num_arms)]
-        return values.index(max(values))
+        chosen_arm, _ = self._choose_and_score(self._as_context(context))
+        return chosen_arm
 
-    def update_weights(self, chosen_arm: int, context: List[float], reward: float):
+    def update_weights(self, chosen_arm: int, context: np.ndarray, reward: float, predicted: Optional[float] = None):
         """
         Updates the weights for the chosen arm based on the received reward.
 
         Args:
             chosen_arm (int): The index of the chosen arm.
-            context (List[float]): The context vector.
+            context (np.ndarray): The context vector. Passing a float32 ndarray avoids a per-call conversion.
             reward (float): The reward received for choosing the arm.
+            predicted (Optional[float]): The score of the chosen arm for this context, if already known. Default is None (recomputed).
         """
-        for i in range(self.num_features):
-            dotp = self.compute_dot_product(self.weights[chosen_arm], context)
-            self.weights[chosen_arm][i] += self.learning_rate * (reward - dotp) * context[i]
+        # Normalize negative indices (and reject out-of-range ones) before they reach the unchecked compiled kernels.
+        chosen_arm = range(self.num_arms)[chosen_arm]
+        context_np = self._as_context(context)
+        w = self.weights[chosen_arm]
+        if predicted is None:
+            predicted = float(w @ context_np)
+        err = reward - predicted
+        if _update_arm_kernel is not None:
+            _update_arm_kernel(self.weights, chosen_arm, context_np, self.learning_rate * err)
+        elif _saxpy is not None:
+            _saxpy(context_np, w, a=self.learning_rate * err)
+        else:
+            w += self.learning_rate * err * context_np
         self.post_update_weights(chosen_arm)
 
 
@@ -88,38 +231,88 @@ class ContextualBandit:
         """
         pass
 
-    def run(self, T: int, get_current_context: Callable[[], List[float]], get_reward: Callable[[int], float]):
+    def step(self, context: np.ndarray, get_reward: Callable[[int], float]) -> int:
+        """
+        Plays one round: chooses an arm for the context, gets its reward and updates that arm's weights.
+
+        This is the loop body of run and run_batched. The chosen arm's score is passed to update_weights as the
+        prediction instead of being recomputed; scoring and updating remain two separate passes.
+
+        Args:
+            context (np.ndarray): The current context vector. Passing a float32 ndarray avoids a per-call conversion.
+            get_reward (Callable[[int], float]): Function to get the reward for a chosen arm.
+
+        Returns:
+            int: The index of the chosen arm.
+        """
+        # get_reward may call back into this instance, so the context must not live in the scratch buffer.
+        context = self._as_context(context, scratch=False)
+        chosen_arm, score = self._choose_and_score(context)
+        reward = get_reward(chosen_arm)
+        self.update_weights(chosen_arm, context, reward, predicted=score)
+        return chosen_arm
+
+    def run(self, T: int, get_current_context: Callable[[], np.ndarray], get_reward: Callable[[int], float]):
         """
         Runs the contextual bandit algorithm for T rounds.
 
         Args:
             T (int): Number of rounds to run the algorithm.
-            get_current_context (Callable[[], List[float]]): Function to get the current context.
+            get_current_context (Callable[[], np.ndarray]): Function to get the current context. Returning a float32 ndarray avoids a per-round conversion.
             get_reward (Callable[[int], float]): Function to get the reward for a chosen arm.
         """
         for t in range(T):
-            context = get_current_context()
-            chosen_arm = self.choose_arm(context)
-            reward = get_reward(chosen_arm)
-            self.update_weights(chosen_arm, context, reward)
+            self.step(get_current_context(), get_reward)
+
+    def run_batched(self, contexts: np.ndarray, get_reward: Callable[[int], float]):
+        """
+        Runs the contextual bandit algorithm over pre-generated contexts, one round per row.
 
-    def offline_policy_evaluation(self, historical_data: List[Tuple[List[float], int, float]]) -> float:
+        Args:
+            contexts (np.ndarray): Array of shape (T, num_features) holding the context of each round.
+            get_reward (Callable[[int], float]): Function to get the reward for a chosen arm.
+        """
+        contexts = np.ascontiguousarray(contexts, dtype=np.float32)
+        if contexts.ndim != 2 or contexts.shape[1] != self.num_features:
+            raise ValueError(f"contexts must have shape (T, {self.num_features}), got {contexts.shape}")
+        for t in range(contexts.shape[0]):
+            self.step(contexts[t], get_reward)
+
+    def offline_policy_evaluation(self, historical_data: List[Tuple[List[float], int, float]], quantized: bool = False) -> float:
         """
         Evaluates the policy using offline data.
 
         Args:
             historical_data (List[Tuple[List[float], int, float]]): List of tuples (context, actual_arm, reward) representing historical interactions.
+            quantized (bool): Whether to score arms with int8-quantized weights and contexts. Arm choices are approximate when scores are close. Default is False.
 
         Returns:
             float: The average reward of the policy on the historical data.
+
+        Raises:
+            ValueError: If historical_data is empty or its contexts do not have num_features entries.
         """
-        total_reward = 0
         num_samples = len(historical_data)
+        if num_samples == 0:
+            raise ValueError("historical_data must contain at least one sample")
+        contexts = np.asarray([h[0] for h in historical_data], dtype=np.float32)
+        if contexts.shape != (num_samples, self.num_features):
+            raise ValueError(f"contexts must have {self.num_features} features, got shape {contexts.shape}")
+        actual_arms = np.fromiter((h[1] for h in historical_data), dtype=np.int64, count=num_samples)
+        rewards = np.fromiter((h[2] for h in historical_data), dtype=np.float32, count=num_samples)
+
+        if quantized:
+            # A single scale for all weights keeps arm scores comparable; per-row context scales do not change the argmax.
+            weights, contexts, zero = _quantize_int8(self.weights), _quantize_int8(contexts, axis=1), np.int64(0)
+        else:
+            weights, zero = self.weights, np.float32(0)
 
-        for context, actual_arm, reward in historical_data:
-            chosen_arm = self.choose_arm(context)
-            if chosen_arm == actual_arm:
-                total_reward += reward
+        if _ope_kernel is not None:
+            total_reward = float(_ope_kernel(weights, contexts, actual_arms, rewards, zero))
+        else:
+            scores = np.matmul(contexts, weights.T, dtype=zero.dtype)
+            chosen_arms = scores.argmax(axis=1)
+            total_reward = float(rewards[chosen_arms == actual_arms].sum())
 
         average_reward = total_reward / num_samples
         return average_reward
@@ -9,6 +9,20 @@ def parse_requirements(filename):
     lineiter = (line.strip() for line in open(filename))
     return [line for line in lineiter if line and not line.startswith("#")]
 
+try:
+    from Cython.Build import cythonize
+except ImportError:
+    # Without Cython the package falls back to the Numba/NumPy kernels.
+    ext_modules = []
+else:
+    ext_modules = cythonize(
+        [setuptools.Extension("knn_bandits._bandit_core", ["knn_bandits/_bandit_core.pyx"], extra_compile_args=["-O3"])],
+        compiler_directives={"language_level": 3},
+    )
+    # cythonize does not carry over optional=True, so mark it here: a failed compile must not fail the install.
+    for ext in ext_modules:
+        ext.optional = True
+
 setuptools.setup(
     name="knn_bandits",
     version="0.0.1",
@@ -45,6 +59,7 @@ setuptools.setup(
         'Programming Language :: Python :: 3.9',
     ],
     packages=setuptools.find_packages(),
+    ext_modules=ext_modules,
     install_requires=parse_requirements('requirements.txt'),
     setup_requires=["pytest-runner"],
     tests_require=["pytest", "pytest-cov"],
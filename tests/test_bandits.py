@@ -1,15 +1,49 @@
+import copy
+import pickle
 import pytest
 import random
 
+import numpy as np
+
+from knn_bandits import bandits
 from knn_bandits.bandits import ContextualBandit
 from typing import List
 
 # Test cases
 def test_initialize_weights():
     bandit = ContextualBandit(num_arms=5, num_features=10)
-    weights = bandit.initialize_weights(10)
-    assert len(weights) == 10
-    assert all(0 <= w <= 1 for w in weights)
+    weights = bandit.initialize_weights(5, 10)
+    assert weights.shape == (5, 10)
+    assert weights.dtype == np.float32
+    assert weights.flags['C_CONTIGUOUS']
+    assert np.all((0 <= weights) & (weights <= 1))
+
+def test_weights_layout_from_overridden_initialize_weights():
+    class ListBandit(ContextualBandit):
+        def initialize_weights(self, num_arms: int, num_features: int):
+            return [[random.random() for _ in range(num_features)] for _ in range(num_arms)]
+
+    bandit = ListBandit(num_arms=5, num_features=10)
+    assert bandit.weights.dtype == np.float32
+    assert bandit.weights.flags['C_CONTIGUOUS']
+    assert 0 <= bandit.choose_arm([random.random() for _ in range(10)]) < 5
+
+def test_seed_reproducibility():
+    bandit1 = ContextualBandit(num_arms=5, num_features=10, seed=42)
+    bandit2 = ContextualBandit(num_arms=5, num_features=10, seed=42)
+    assert np.array_equal(bandit1.weights, bandit2.weights)
+
+def test_no_instance_dict():
+    bandit = ContextualBandit(num_arms=5, num_features=10)
+    assert not hasattr(bandit, '__dict__')
+
+def test_pickle_round_trip():
+    bandit = ContextualBandit(num_arms=5, num_features=10, seed=0)
+    context = np.random.random(10).astype(np.float32)
+    for restored in (pickle.loads(pickle.dumps(bandit)), copy.deepcopy(bandit)):
+        assert np.array_equal(restored.weights, bandit.weights)
+        assert restored.learning_rate == bandit.learning_rate
+        assert restored.choose_arm(context) == bandit.choose_arm(context)
 
 def test_choose_arm():
     bandit = ContextualBandit(num_arms=5, num_features=10)
@@ -17,15 +51,75 @@ def test_choose_arm():
     chosen_arm = bandit.choose_arm(context)
     assert 0 <= chosen_arm < 5
 
+def test_choose_arm_picks_highest_score():
+    bandit = ContextualBandit(num_arms=5, num_features=10)
+    context = [random.random() for _ in range(10)]
+    values = [float(np.dot(arm_weights, context)) for arm_weights in bandit.weights]
+    assert bandit.choose_arm(context) == values.index(max(values))
+
+def test_choose_arm_ties_pick_first_arm():
+    bandit = ContextualBandit(num_arms=5, num_features=10)
+    bandit.weights[:] = 1.0
+    assert bandit.choose_arm([1.0] * 10) == 0
+
+def test_as_context():
+    bandit = ContextualBandit(num_arms=5, num_features=10)
+    context = np.random.random(10).astype(np.float32)
+    assert bandit._as_context(context) is context
+    converted = bandit._as_context([1.0] * 10)
+    assert converted.dtype == np.float32
+    assert np.array_equal(converted, np.ones(10, dtype=np.float32))
+
+def test_wrong_context_width_is_rejected():
+    bandit = ContextualBandit(num_arms=5, num_features=10)
+    with pytest.raises(ValueError):
+        bandit.choose_arm(np.ones(3, dtype=np.float32))
+    with pytest.raises(ValueError):
+        bandit.step(np.ones(3, dtype=np.float32), lambda chosen_arm: 1.0)
+    with pytest.raises(ValueError):
+        bandit.run_batched(np.ones((5, 3)), lambda chosen_arm: 1.0)
+    for context in ([0.5] * 3, [0.5], 0.5, np.ones(1)):
+        with pytest.raises(ValueError):
+            bandit.choose_arm(context)
+        with pytest.raises(ValueError):
+            bandit.update_weights(0, context, 1.0)
+        with pytest.raises(ValueError):
+            bandit.step(context, lambda chosen_arm: 1.0)
+
 def test_update_weights():
     bandit = ContextualBandit(num_arms=5, num_features=10)
     context = [random.random() for _ in range(10)]
     chosen_arm = 0
-    initial_weights = bandit.weights[chosen_arm][:]
+    initial_weights = bandit.weights[chosen_arm].copy()
     reward = 1.0
     bandit.update_weights(chosen_arm, context, reward)
     updated_weights = bandit.weights[chosen_arm]
-    assert initial_weights != updated_weights
+    assert not np.array_equal(initial_weights, updated_weights)
+
+def test_update_weights_with_predicted():
+    bandit1 = ContextualBandit(num_arms=5, num_features=10, seed=0)
+    bandit2 = ContextualBandit(num_arms=5, num_features=10, seed=0)
+    context = np.random.random(10).astype(np.float32)
+    chosen_arm, score = bandit1._choose_and_score(context)
+    assert chosen_arm == bandit2.choose_arm(context)
+    bandit1.update_weights(chosen_arm, context, 1.0, predicted=score)
+    bandit2.update_weights(chosen_arm, context, 1.0)
+    np.testing.assert_allclose(bandit1.weights, bandit2.weights, rtol=1e-5)
+
+@pytest.mark.parametrize("backend", ["default", "numpy"])
+def test_update_weights_negative_arm(monkeypatch, backend):
+    if backend == "numpy":
+        force_numpy_fallback(monkeypatch)
+    bandit1 = ContextualBandit(num_arms=5, num_features=10, seed=0)
+    bandit2 = ContextualBandit(num_arms=5, num_features=10, seed=0)
+    context = [random.random() for _ in range(10)]
+    bandit1.update_weights(-1, context, 1.0)
+    bandit2.update_weights(4, context, 1.0)
+    np.testing.assert_array_equal(bandit1.weights, bandit2.weights)
+    with pytest.raises(IndexError):
+        bandit1.update_weights(5, context, 1.0)
+    with pytest.raises(IndexError):
+        bandit1.update_weights(-6, context, 1.0)
 
 def test_offline_policy_evaluation():
     bandit = ContextualBandit(num_arms=5, num_features=10)
@@ -39,6 +133,77 @@ def test_offline_policy_evaluation():
     average_reward = bandit.offline_policy_evaluation(historical_data)
     assert 0 <= average_reward <= 1
 
+def test_offline_policy_evaluation_matches_choose_arm():
+    bandit = ContextualBandit(num_arms=5, num_features=10)
+    historical_data = [([random.random() for _ in range(10)], random.randrange(5), random.random()) for _ in range(100)]
+    expected = sum(reward for context, actual_arm, reward in historical_data if bandit.choose_arm(context) == actual_arm) / len(historical_data)
+    assert bandit.offline_policy_evaluation(historical_data) == pytest.approx(expected, rel=1e-5)
+
+def test_offline_policy_evaluation_invalid_data():
+    bandit = ContextualBandit(num_arms=5, num_features=10)
+    with pytest.raises(ValueError):
+        bandit.offline_policy_evaluation([])
+    with pytest.raises(ValueError):
+        bandit.offline_policy_evaluation([([random.random() for _ in range(3)], 0, 1.0)])
+
+def test_offline_policy_evaluation_quantized():
+    bandit = ContextualBandit(num_arms=5, num_features=10)
+    historical_data = [([random.random() for _ in range(10)], random.randrange(5), random.random()) for _ in range(100)]
+    average_reward = bandit.offline_policy_evaluation(historical_data, quantized=True)
+    assert 0 <= average_reward <= 1
+
+    # Well-separated scores survive quantization unchanged.
+    bandit.weights[:] = 0.0
+    bandit.weights[2] = 1.0
+    assert bandit.offline_policy_evaluation(historical_data, quantized=True) == pytest.approx(bandit.offline_policy_evaluation(historical_data))
+
+@pytest.mark.parametrize("backend", ["default", "numpy"])
+def test_offline_policy_evaluation_quantized_wide_features(monkeypatch, backend):
+    # 127 * 127 * num_features overflows an int32 accumulator for contexts this wide.
+    if backend == "numpy":
+        force_numpy_fallback(monkeypatch)
+    bandit = ContextualBandit(num_arms=2, num_features=200000)
+    bandit.weights[0] = 1.0
+    bandit.weights[1] = 0.5
+    historical_data = [(np.ones(200000, dtype=np.float32), 0, 1.0)]
+    assert bandit.offline_policy_evaluation(historical_data) == 1.0
+    assert bandit.offline_policy_evaluation(historical_data, quantized=True) == 1.0
+
+def test_step():
+    bandit = ContextualBandit(num_arms=5, num_features=10)
+    context = [random.random() for _ in range(10)]
+    expected_arm = bandit.choose_arm(context)
+    rewarded_arms = []
+
+    def get_reward(chosen_arm: int) -> float:
+        rewarded_arms.append(chosen_arm)
+        return 1.0
+
+    initial_weights = bandit.weights.copy()
+    chosen_arm = bandit.step(context, get_reward)
+    assert chosen_arm == expected_arm
+    assert rewarded_arms == [chosen_arm]
+    assert not np.array_equal(initial_weights[chosen_arm], bandit.weights[chosen_arm])
+    other_arms = [arm for arm in range(5) if arm != chosen_arm]
+    assert np.array_equal(initial_weights[other_arms], bandit.weights[other_arms])
+
+@pytest.mark.parametrize("backend", ["default", "numpy"])
+def test_step_reward_callback_reusing_bandit(monkeypatch, backend):
+    if backend == "numpy":
+        force_numpy_fallback(monkeypatch)
+    bandit1 = ContextualBandit(num_arms=5, num_features=10, seed=0)
+    bandit2 = ContextualBandit(num_arms=5, num_features=10, seed=0)
+    context = [1.0] + [0.0] * 9
+    other_context = [0.0] * 3 + [1.0] + [0.0] * 6
+
+    def get_reward_reusing_bandit(chosen_arm: int) -> float:
+        bandit1.choose_arm(other_context)
+        return 1.0
+
+    bandit1.step(context, get_reward_reusing_bandit)
+    bandit2.step(context, lambda chosen_arm: 1.0)
+    np.testing.assert_array_equal(bandit1.weights, bandit2.weights)
+
 def test_run():
     bandit = ContextualBandit(num_arms=5, num_features=10)
 
@@ -48,10 +213,113 @@ def test_run():
     def get_reward(chosen_arm: int) -> float:
         return random.random()
 
-    initial_weights = [list(arm_weights) for arm_weights in bandit.weights]
+    initial_weights = bandit.weights.copy()
     bandit.run(T=10, get_current_context=get_current_context, get_reward=get_reward)
     updated_weights = bandit.weights
-    assert initial_weights != updated_weights
+    assert not np.array_equal(initial_weights, updated_weights)
+
+def test_run_batched():
+    bandit = ContextualBandit(num_arms=5, num_features=10)
+    contexts = np.random.random((10, 10))
+    chosen_arms = []
+
+    def get_reward(chosen_arm: int) -> float:
+        chosen_arms.append(chosen_arm)
+        return random.random()
+
+    initial_weights = bandit.weights.copy()
+    bandit.run_batched(contexts, get_reward=get_reward)
+    assert len(chosen_arms) == 10
+    assert all(0 <= arm < 5 for arm in chosen_arms)
+    assert not np.array_equal(initial_weights, bandit.weights)
+
+def force_numpy_fallback(monkeypatch):
+    """Disables the Cython, Numba and BLAS backends so the pure NumPy path is exercised."""
+    for name in ('_choose_arm_kernel', '_update_arm_kernel', '_ope_kernel', '_sgemv', '_saxpy'):
+        monkeypatch.setattr(bandits, name, None)
+
+def reference_choose(W, ctx):
+    scores = W.astype(np.float64) @ ctx.astype(np.float64)
+    return int(scores.argmax()), float(scores.max())
+
+def reference_ope(W, X, actual_arms, rewards):
+    chosen_arms = np.matmul(X, W.T, dtype=np.float64 if W.dtype == np.float32 else np.int64).argmax(axis=1)
+    return float(rewards[chosen_arms == actual_arms].sum())
+
+def random_problem(num_arms=7, num_features=33, num_samples=200):
+    rng = np.random.default_rng(0)
+    W = rng.random((num_arms, num_features), dtype=np.float32)
+    X = rng.random((num_samples, num_features), dtype=np.float32)
+    actual_arms = rng.integers(0, num_arms, num_samples)
+    rewards = rng.random(num_samples, dtype=np.float32)
+    return W, X, actual_arms, rewards
+
+def check_kernels(choose_arm, update_arm):
+    W, X, _, _ = random_problem()
+    for ctx in X[:20]:
+        chosen_arm, score = choose_arm(W, ctx)
+        expected_arm, expected_score = reference_choose(W, ctx)
+        assert chosen_arm == expected_arm
+        assert score == pytest.approx(expected_score, rel=1e-5)
+
+    updated = W.copy()
+    update_arm(updated, 3, X[0], 0.5)
+    expected = W.copy()
+    expected[3] += 0.5 * X[0]
+    np.testing.assert_allclose(updated, expected, rtol=1e-6)
+
+def test_numba_kernels():
+    pytest.importorskip("numba")
+    check_kernels(bandits._nb_choose_arm, bandits._nb_update_arm)
+
+def test_cython_kernels():
+    core = pytest.importorskip("knn_bandits._bandit_core")
+    check_kernels(core.choose_arm, core.update_arm)
+
+def test_numba_ope_kernel():
+    pytest.importorskip("numba")
+    W, X, actual_arms, rewards = random_problem()
+    total_reward = bandits._ope_kernel(W, X, actual_arms, rewards, np.float32(0))
+    assert total_reward == pytest.approx(reference_ope(W, X, actual_arms, rewards), rel=1e-5)
+
+    W_q8, X_q8 = bandits._quantize_int8(W), bandits._quantize_int8(X, axis=1)
+    total_reward = bandits._ope_kernel(W_q8, X_q8, actual_arms, rewards, np.int64(0))
+    assert total_reward == pytest.approx(reference_ope(W_q8, X_q8, actual_arms, rewards), rel=1e-5)
+
+def test_blas_backend(monkeypatch):
+    pytest.importorskip("scipy")
+    monkeypatch.setattr(bandits, '_choose_arm_kernel', None)
+    monkeypatch.setattr(bandits, '_update_arm_kernel', None)
+    assert bandits._sgemv is not None and bandits._saxpy is not None
+
+    bandit = ContextualBandit(num_arms=7, num_features=33, seed=0)
+    _, X, _, _ = random_problem()
+    for ctx in X[:20]:
+        chosen_arm, score = bandit._choose_and_score(ctx)
+        expected_arm, expected_score = reference_choose(bandit.weights, ctx)
+        assert chosen_arm == expected_arm
+        assert score == pytest.approx(expected_score, rel=1e-5)
+
+    expected = bandit.weights.copy()
+    expected[3] += bandit.learning_rate * (1.0 - 2.0) * X[0]
+    bandit.update_weights(3, X[0], 1.0, predicted=2.0)
+    np.testing.assert_allclose(bandit.weights, expected, rtol=1e-6)
+
+def test_numpy_fallback_matches_default_backend(monkeypatch):
+    _, X, actual_arms, rewards = random_problem()
+    historical_data = list(zip(X, actual_arms, rewards))
+
+    def play(bandit):
+        bandit.run_batched(X[:20], get_reward=lambda chosen_arm: chosen_arm / 7)
+        return bandit.weights, bandit.offline_policy_evaluation(historical_data), bandit.offline_policy_evaluation(historical_data, quantized=True)
+
+    default_results = play(ContextualBandit(num_arms=7, num_features=33, seed=0))
+    force_numpy_fallback(monkeypatch)
+    fallback_results = play(ContextualBandit(num_arms=7, num_features=33, seed=0))
+
+    np.testing.assert_allclose(default_results[0], fallback_results[0], rtol=1e-4)
+    assert default_results[1] == pytest.approx(fallback_results[1], rel=1e-5)
+    assert default_results[2] == pytest.approx(fallback_results[2], rel=1e-5)
 
 if __name__ == "__main__":
     pytest.main()